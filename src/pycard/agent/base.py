@@ -1,7 +1,7 @@
 import abc
 import random
 from collections import defaultdict
-from typing import List, Optional
+from typing import List
 
 from pycard.model import deck, game
 
@@ -22,6 +22,12 @@ class Agent(abc.ABC):
         self.hand: List = hand
         self.melds: List = []
 
+    def reset(self) -> None:
+        """Empty hand and melds in place, so the agent can be dealt into a new game.
+        """
+        self.hand.clear()
+        self.melds.clear()
+
     @abc.abstractmethod
     def draw(self, game: 'game.Game'):
         pass
@@ -58,54 +64,53 @@ class DummyAgent(Agent):
         melds = self._find_meld(game)
         if melds:
             # Choose the top scoring meld
-            meld = sorted(
-                [(meld, sum([deck.CARD_VALUE_MAP[x.rank] for x in meld])) for meld in melds],
-                key=lambda x: x[1],
-                reverse=True)[0][0]
+            meld = max(melds, key=_meld_value)
             for card in meld:
                 self.hand.remove(card)
 
             self.melds.append(meld)
 
     def discard(self, game: 'game.Game') -> None:
-        meld_cards = set([x for m in self._find_meld(game) for x in m])
         game.discard.append(self.hand.pop())
 
     def _find_meld(self, game: 'game.Game') -> List[List[deck.Card]]:
-        def get_ascending(cards: List[deck.Card]) -> Optional[List[deck.Card]]:
-            runs, start_run, end_run = [], 0, 0
-            for i, (c1, c2) in enumerate(zip(cards, cards[1:])):
-                if end_run - start_run > 2:
-                    runs.append(cards[start_run:end_run])
-
-                if deck.CARD_VALUE_MAP[c2.rank] - deck.CARD_VALUE_MAP[c1.rank] == 1:
-                    end_run += 1
-                else:
-                    start_run, end_run = i + 1, i + 1
-
-            return runs
-
         melds = []
 
-        # Determine sets
-        sets = defaultdict(list)
+        # Group by rank (sets) and by suit (runs) in one pass
+        sets, suitdict = defaultdict(list), defaultdict(list)
         for card in self.hand:
             sets[card.rank].append(card)
+            suitdict[card.suit].append(card)
 
         for s in sets.values():
             if len(s) >= 3:
                 melds.append(s)
 
-        # Determine runs
-        suitdict = defaultdict(list)
-        for card in self.hand:
-            suitdict[card.suit].append(card)
+        for cs in suitdict.values():
+            cs.sort(key=_card_value)
+            melds.extend(_ascending_runs(cs))
 
-        suitdict = {k: sorted(v, key=lambda x: deck.CARD_VALUE_MAP[x.rank]) for k, v in suitdict.items()}
+        melds.sort(key=len, reverse=True)
+        return melds
 
-        for cs in suitdict.values():
-            runs = get_ascending(cs)
-            if runs:
-                melds.extend(runs)
 
-        return sorted(melds, key=lambda x: len(x), reverse=True)
+def _card_value(card: deck.Card) -> int:
+    return deck.CARD_VALUE_MAP[card.rank]
+
+
+def _meld_value(meld: List[deck.Card]) -> int:
+    return sum(deck.CARD_VALUE_MAP[x.rank] for x in meld)
+
+
+def _ascending_runs(cards: List[deck.Card]) -> List[List[deck.Card]]:
+    runs, start_run, end_run = [], 0, 0
+    for i, (c1, c2) in enumerate(zip(cards, cards[1:])):
+        if end_run - start_run > 2:
+            runs.append(cards[start_run:end_run])
+
+        if deck.CARD_VALUE_MAP[c2.rank] - deck.CARD_VALUE_MAP[c1.rank] == 1:
+            end_run += 1
+        else:
+            start_run, end_run = i + 1, i + 1
+
+    return runs
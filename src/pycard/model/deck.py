@@ -31,6 +31,9 @@ class Suit(enum.Enum):
     spades = 4
 
 
+STANDARD_CARDS = tuple(Card(r, s) for r in RANK_MAP.keys() for s in Suit)
+
+
 class Deck:
 
     DECK_SIZE = 52
@@ -43,14 +46,34 @@ class Deck:
                 deck.
         """
         if not cards:
-            self._cards = [Card(r, s) for r in RANK_MAP.keys() for s in Suit]
+            self._cards = list(STANDARD_CARDS)
         else:
             self._cards = cards
+        self._rng = None
 
-    def shuffle(self) -> None:
+    def shuffle(self, seed: int = None) -> None:
         """Shuffle cards.
+
+        Arguments:
+            seed: If given, shuffle with a private RNG seeded with this value so the resulting
+                order is reproducible.
         """
-        random.shuffle(self._cards)
+        if seed is None:
+            random.shuffle(self._cards)
+        else:
+            if self._rng is None:
+                self._rng = random.Random()
+            self._rng.seed(seed)
+            self._rng.shuffle(self._cards)
+
+    def reset(self, cards: Tuple[Card, ...] = None) -> None:
+        """Refill the deck in place, without shuffling.
+
+        Arguments:
+            cards: Cards to refill the deck with, in order. If blank, use the standard 52 card, four
+                suit deck.
+        """
+        self._cards[:] = STANDARD_CARDS if cards is None else cards
 
     def draw(self) -> Card:
         """Draw a card from the deck.
@@ -79,6 +102,21 @@ class Deck:
         hands = [self._cards[i * count: i * count + count] for i in range(players)]
         return (hands, Deck(cards=self._cards[count*players:]))
 
+    def deal_into(self, hands: List[List[Card]], count: int) -> None:
+        """In-place variant of deal: extend each of the given hands and remove the dealt cards from
+        this deck. Cards are handed out in the same order as deal.
+
+        Arguments:
+            hands: Hands to deal into, one per player.
+            count: Number of cards to deal to each hand.
+        """
+        if count * len(hands) > len(self._cards):
+            raise ValueError("Deck not large enough.")
+
+        for i, hand in enumerate(hands):
+            hand.extend(self._cards[i * count: i * count + count])
+        del self._cards[:count * len(hands)]
+
     def __len__(self):
         return len(self._cards)
 
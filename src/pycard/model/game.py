@@ -1,6 +1,8 @@
+import contextlib
 import os
 import numpy as np
 import sys
+from typing import List
 
 from pycard.model import deck
 from pycard.agent import base, human
@@ -8,9 +10,14 @@ from pycard.agent import base, human
 
 class Game:
 
-    def __init__(self, debug: bool = False):
+    def __init__(self, debug: bool = False, history: bool = True):
         """Class for managing both the game state (discard and stock) and players.
 
+        Arguments:
+            debug: Print debug information.
+            history: Record a snapshot of the table every round. Only needed for printing the game
+                state, so simulations can turn it off.
+
         Attributes:
             discard: list of deck.Cards, representing the discard pile
             stock: Deck of cards, representing remaining cards.
@@ -20,22 +27,23 @@ class Game:
         self.stock = None
         self.players = {}
         self._debug = debug
+        self._history = history
         self._state_history = []
+        # Cards of a custom deck passed to initialize, so reset can deal them again
+        self._cards = None
 
     @classmethod
-    def initialize(cls, debug: bool = False, d: deck.Deck = None, num_players: int = 1, num_computers: int = 0):
-        obj = cls()
+    def initialize(cls, debug: bool = False, d: deck.Deck = None, num_players: int = 1, num_computers: int = 0,
+                   seed: int = None, history: bool = True):
+        obj = cls(history=history)
 
         if not d:
             d = deck.Deck()
-            d.shuffle()
-
-        # Hand size of 7 for > 2 players, 13 for two players
-        hand_size = 7
-        if num_players + num_computers == 2:
-            hand_size = 13
+            d.shuffle(seed=seed)
+        else:
+            obj._cards = tuple(d._cards)
 
-        hands, obj.stock = d.deal(hand_size, num_players + num_computers)
+        hands, obj.stock = d.deal(hand_size(num_players + num_computers), num_players + num_computers)
         obj.debug = debug
 
         for i in range(num_players + num_computers):
@@ -49,22 +57,58 @@ class Game:
         obj._build_state()
         return obj
 
+    def reset(self, seed: int = None) -> 'Game':
+        """Start a new deal with the same players, reusing the stock, discard pile, hands and
+        players in place instead of allocating new ones.
+
+        A game started from the standard deck is reshuffled, and with the same seed the deal is
+        identical to the one from `initialize`. A game started from a custom deck is dealt the same
+        cards again, in their original order unless a seed is given.
+
+        Arguments:
+            seed: Passed on to deck.Deck.shuffle.
+
+        Returns:
+            The game itself.
+        """
+        self.discard.clear()
+        self._state_history.clear()
+        for player in self.players.values():
+            player.reset()
+
+        self.stock.reset(cards=self._cards)
+        if self._cards is None or seed is not None:
+            self.stock.shuffle(seed=seed)
+        self.stock.deal_into([player.hand for player in self.players.values()], hand_size(len(self.players)))
+
+        self._build_state()
+        return self
+
     def play(self) -> None:
         """Main game loop. Allow players to draw/discard/meld until (1) they run out of cards or (2)
         the stock runs out of cards.
         """
+        scores = self.run()
+        print("============================================================")
+        print(f"Game over. {scores[0][0]} wins. Final scores:")
+        for player_name, score in scores:
+            print(f"\t{player_name}: {score}")
+        print("============================================================")
+        sys.exit(0)
+
+    def run(self) -> [(str, int)]:
+        """Play turns until the game ends, without printing results or exiting.
+
+        Returns:
+            Final scores as (player name, score) pairs, best first.
+        """
+        order = [player for _, player in sorted(self.players.items())]
         while True:
-            for player_name, player in sorted(self.players.items()):
+            for player in order:
                 self.play_turn(player)
 
                 if (len(player.hand) == 0) or (len(self.stock) == 0):
-                    scores = self.score_players()
-                    print("============================================================")
-                    print(f"Game over. {scores[0][0]} wins. Final scores:")
-                    for player_name, score in scores:
-                        print(f"\t{player_name}: {score}")
-                    print("============================================================")
-                    sys.exit(0)
+                    return self.score_players()
 
             self._build_state()
 
@@ -116,7 +160,8 @@ class Game:
             os.system('clear')
             print(f"Current player: {current_player}")
 
-        s = self._state_history[-1]
+        # Games without history (e.g. from a GamePool) show the current table instead
+        s = self._state_history[-1] if self._state_history else self._snapshot()
         for k, v in s.items():
             print(k, v)
 
@@ -174,6 +219,10 @@ class Game:
     # Private methods
     ################################################################################################
     def _build_state(self):
+        if self._history:
+            self._state_history.append(self._snapshot())
+
+    def _snapshot(self) -> dict:
         state_dict = {}
         state_dict['stock'] = list(self.stock._cards)
         state_dict['discard'] = list(self.discard)
@@ -184,4 +233,59 @@ class Game:
             state_dict['players'][player_name]['hand'] = list(player.hand)
             state_dict['players'][player_name]['melds'] = list(player.melds)
 
-        self._state_history.append(state_dict)
+        return state_dict
+
+
+class GamePool:
+
+    def __init__(self, num_computers: int, size: int = 0):
+        """Pool of computer-only games for simulation loops. Games checked out of the pool are reset
+        rather than rebuilt, so a steady-state loop keeps reusing the same decks, agents and hands.
+
+        Arguments:
+            num_computers: Number of computer players in each game.
+            size: Number of games to create up front. More are created on demand.
+        """
+        self.num_computers = num_computers
+        self._free: List[Game] = [self._create() for _ in range(size)]
+
+    def acquire(self, seed: int = None) -> Game:
+        """Check out a freshly dealt game. Hand it back with release when done.
+        """
+        try:
+            g = self._free.pop()
+        except IndexError:
+            return self._create(seed)
+        return g.reset(seed=seed)
+
+    def release(self, g: Game) -> None:
+        """Return a game checked out with acquire. The pool resets it on the next checkout, so the
+        caller must not keep using it.
+        """
+        self._free.append(g)
+
+    @contextlib.contextmanager
+    def checkout(self, seed: int = None):
+        """Context manager around acquire and release, returning the game to the pool even if
+        playing it raises.
+
+        Arguments:
+            seed: Passed on to Game.reset.
+        """
+        g = self.acquire(seed=seed)
+        try:
+            yield g
+        finally:
+            self.release(g)
+
+    def __len__(self):
+        return len(self._free)
+
+    def _create(self, seed: int = None) -> Game:
+        return Game.initialize(num_players=0, num_computers=self.num_computers, seed=seed, history=False)
+
+
+def hand_size(num_players: int) -> int:
+    """Number of cards dealt to each player: 13 for two players, 7 otherwise.
+    """
+    return 13 if num_players == 2 else 7
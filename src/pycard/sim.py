@@ -0,0 +1,489 @@
+"""Distributed simulation of computer-only games.
+
+A coordinator splits a range of deal seeds into fixed batches and hands them out to workers over
+sockets. Workers play each seeded game and send the results for a batch back as soon as it is done.
+Every completed batch is appended to a checkpoint file, so an interrupted run can be restarted with
+the same arguments and will only play the batches that are still missing.
+"""
+import argparse
+import ipaddress
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections import namedtuple
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+from typing import Dict, List, Tuple
+
+from pycard.model import deck, game
+
+
+# Public, so only accepted on loopback addresses; see resolve_authkey
+DEFAULT_AUTHKEY = b'pycard'
+AUTHKEY_ENV = 'PYCARD_AUTHKEY'
+
+Batch = namedtuple('Batch', ['id', 'seeds'])
+WorkerStats = namedtuple('WorkerStats', ['name', 'batches', 'games', 'busy'])
+Straggler = namedtuple('Straggler', ['batch', 'worker', 'elapsed'])
+Failure = namedtuple('Failure', ['batch', 'error'])
+Report = namedtuple('Report', ['games', 'resumed', 'elapsed', 'workers', 'stragglers', 'failed'])
+
+
+def play_game(seed: int, num_computers: int, pool: game.GamePool = None) -> Dict:
+    """Play a single computer-only game from a seeded deal.
+
+    Arguments:
+        seed: Seed used to shuffle the deck.
+        num_computers: Number of computer players.
+        pool: If given, check the game out of this pool instead of building a new one.
+
+    Returns:
+        A JSON-serializable dictionary with the seed, the winner and every player's score.
+    """
+    if pool is None:
+        scores = game.Game.initialize(num_players=0, num_computers=num_computers, seed=seed).run()
+    else:
+        with pool.checkout(seed=seed) as g:
+            scores = g.run()
+    return {'seed': seed, 'winner': scores[0][0], 'scores': dict(scores)}
+
+
+def resolve_authkey(host: str, authkey: bytes = None) -> bytes:
+    """Pick the shared secret for a coordinator or worker.
+
+    Connections unpickle whatever the other side sends, so the authkey is all that keeps other
+    machines from running code on ours. The built-in DEFAULT_AUTHKEY is public and only accepted
+    for loopback hosts.
+
+    Arguments:
+        host: Host the coordinator listens on or the worker connects to.
+        authkey: Explicit shared secret, if any.
+
+    Returns:
+        The authkey to use.
+    """
+    if authkey is not None and authkey != DEFAULT_AUTHKEY:
+        return authkey
+
+    try:
+        loopback = ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        loopback = False
+    if not loopback:
+        raise ValueError(f"An explicit authkey is required for non-loopback host \"{host}\".")
+
+    return DEFAULT_AUTHKEY
+
+
+def make_batches(num_games: int, batch_size: int, start_seed: int = 0) -> List[Batch]:
+    """Split a seed range into batches. The split only depends on the arguments, so batch ids are
+    stable across restarts.
+    """
+    if batch_size < 1:
+        raise ValueError("Batch size must be positive.")
+
+    return [Batch(i, list(range(start_seed + lo, start_seed + min(lo + batch_size, num_games))))
+            for i, lo in enumerate(range(0, num_games, batch_size))]
+
+
+class Checkpoint:
+
+    def __init__(self, path: str, config: Dict):
+        """Append-only record of finished batches.
+
+        The first line of the file holds the run configuration, every following line one finished
+        batch. Unreadable lines (e.g. a torn last line from a crash mid-write) are ignored on load.
+        A missing or empty file starts a fresh checkpoint; any other file without a readable header
+        raises a ValueError rather than being overwritten.
+
+        Arguments:
+            path: Location of the checkpoint file.
+            config: Run configuration. Resuming from a file written with a different configuration
+                raises a ValueError, since batch ids would no longer refer to the same seeds.
+        """
+        self.path = path
+        self.config = config
+        self.completed: Dict[int, List[Dict]] = {}
+
+    def load(self) -> Dict[int, List[Dict]]:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            self._rewrite()
+            return self.completed
+
+        with open(self.path) as f:
+            lines = f.read().split('\n')
+
+        try:
+            header = json.loads(lines[0])['config']
+        except (ValueError, TypeError, KeyError):
+            raise ValueError(f"\"{self.path}\" is not a checkpoint file.")
+
+        if header != self.config:
+            raise ValueError(f"Checkpoint \"{self.path}\" was written for a different run: {header}")
+
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+                self.completed[entry['batch']] = entry['results']
+            except (ValueError, TypeError, KeyError):
+                continue
+
+        # Drop torn lines so new entries start on a fresh one
+        self._rewrite()
+        return self.completed
+
+    def record(self, batch_id: int, results: List[Dict]) -> None:
+        with open(self.path, 'a') as f:
+            f.write(json.dumps({'batch': batch_id, 'results': results}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.completed[batch_id] = results
+
+    def results(self) -> List[Dict]:
+        return [r for _, results in sorted(self.completed.items()) for r in results]
+
+    def _rewrite(self) -> None:
+        # Write next to the checkpoint and swap it in, so a crash never leaves a half-written file
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(json.dumps({'config': self.config}) + '\n')
+            for batch_id, results in sorted(self.completed.items()):
+                f.write(json.dumps({'batch': batch_id, 'results': results}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+class Coordinator:
+
+    def __init__(self, checkpoint: str, num_games: int, batch_size: int = 100, start_seed: int = 0,
+                 num_computers: int = 2, address: Tuple[str, int] = ('localhost', 0),
+                 authkey: bytes = None, straggler_factor: float = 3.0, max_failures: int = 3,
+                 batch_timeout: float = 600.0):
+        """Hand out batches of seeded games to workers and collect their results.
+
+        Arguments:
+            checkpoint: Path of the checkpoint file. An existing file is resumed.
+            num_games: Total number of games in the run.
+            batch_size: Number of games per batch.
+            start_seed: Seed of the first game; game i uses seed start_seed + i.
+            num_computers: Number of computer players per game.
+            address: (host, port) to listen on. Port 0 picks a free port, see `address`.
+            authkey: Shared secret workers must present. Required unless listening on a loopback
+                address, see `resolve_authkey`.
+            straggler_factor: A batch is reported as a straggler if it took more than this many
+                times the median batch time. Running batches past that point are also printed to
+                stderr as they happen.
+            max_failures: Give up on a batch after it failed (raised on the worker, the worker
+                dropped out, timed out or sent a malformed reply) this many times. Failed batches
+                are reported and not checkpointed, so a later resume tries them again.
+            batch_timeout: Seconds to wait for a worker to return a batch before dropping the worker
+                and counting a failure. None waits forever.
+        """
+        if num_computers < 1 or num_computers * game.hand_size(num_computers) > deck.Deck.DECK_SIZE:
+            raise ValueError(f"Cannot deal a game for {num_computers} computer players.")
+
+        self.num_computers = num_computers
+        self.straggler_factor = straggler_factor
+        self.max_failures = max_failures
+        self.batch_timeout = batch_timeout
+        self.batches = {b.id: b for b in make_batches(num_games, batch_size, start_seed)}
+        self.checkpoint = Checkpoint(checkpoint, {
+            'num_games': num_games, 'batch_size': batch_size, 'start_seed': start_seed,
+            'num_computers': num_computers,
+        })
+
+        # Workers authenticate in their handler thread, so one bad client can't stall the accept loop
+        self._authkey = resolve_authkey(address[0], authkey)
+        self._listener = Listener(address)
+        self._cond = threading.Condition()
+        self._pending: List[int] = []
+        self._running: Dict[int, Tuple[str, float]] = {}
+        self._failures: Dict[int, int] = {}
+        self._failed: Dict[int, str] = {}
+        self._timings: List[Tuple[int, str, float]] = []
+        self._workers: List[List] = []
+        self._handlers: List[threading.Thread] = []
+        self._warned = set()
+        self._done = False
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._listener.address
+
+    def serve(self) -> Report:
+        """Block until every batch is finished or has failed, then tell the workers to stop.
+
+        Returns:
+            A Report on the games played in this session.
+        """
+        try:
+            completed = self.checkpoint.load()
+            resumed = sum(len(r) for r in completed.values())
+            self._pending = [i for i in sorted(self.batches) if i not in completed]
+            start = time.monotonic()
+
+            if self._pending:
+                accept = threading.Thread(target=self._accept, daemon=True)
+                accept.start()
+
+                with self._cond:
+                    while len(self.checkpoint.completed) + len(self._failed) < len(self.batches):
+                        self._cond.wait(timeout=1.0)
+                        self._warn_stragglers()
+                    self._done = True
+                    self._cond.notify_all()
+
+                # Wake the accept loop with a bare connection so it notices we are done
+                try:
+                    socket.create_connection(self.address, timeout=5).close()
+                except OSError:
+                    pass
+                accept.join(timeout=5)
+
+                with self._cond:
+                    handlers = list(self._handlers)
+                for handler in handlers:
+                    handler.join()
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+            self._listener.close()
+
+        return self._report(resumed, time.monotonic() - start)
+
+    def results(self) -> List[Dict]:
+        """Results of every finished game, ordered by seed."""
+        return self.checkpoint.results()
+
+    def _accept(self) -> None:
+        while not self._done:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn) -> None:
+        try:
+            deliver_challenge(conn, self._authkey)
+            answer_challenge(conn, self._authkey)
+            _, name = conn.recv()
+        except Exception:
+            # Failed handshake, or not a worker at all (e.g. the wake-up connection from serve)
+            conn.close()
+            return
+
+        stats = [str(name), 0, 0, 0.0]
+        with self._cond:
+            self._workers.append(stats)
+            self._handlers.append(threading.current_thread())
+
+        try:
+            while True:
+                with self._cond:
+                    while not self._pending and not self._done:
+                        self._cond.wait()
+                    if self._done:
+                        conn.send(('stop',))
+                        return
+                    batch_id = self._pending.pop(0)
+                    self._running[batch_id] = (name, time.monotonic())
+
+                try:
+                    status, payload = self._exchange(conn, batch_id)
+                except Exception as e:
+                    # The connection is in an unknown state; give up on this worker and let the
+                    # batch be retried elsewhere
+                    error = 'worker disconnected' if isinstance(e, EOFError) else repr(e)
+                    with self._cond:
+                        del self._running[batch_id]
+                        self._fail(batch_id, f'{name}: {error}')
+                        self._cond.notify_all()
+                    return
+
+                with self._cond:
+                    _, started = self._running.pop(batch_id)
+                    elapsed = time.monotonic() - started
+                    if status == 'error':
+                        self._fail(batch_id, f'{name}: {payload}')
+                    else:
+                        try:
+                            if batch_id not in self.checkpoint.completed:
+                                self.checkpoint.record(batch_id, payload)
+                        except Exception as e:
+                            self._fail(batch_id, f'checkpoint write failed: {e!r}')
+                        else:
+                            stats[1] += 1
+                            stats[2] += len(payload)
+                            stats[3] += elapsed
+                            self._timings.append((batch_id, name, elapsed))
+                    self._cond.notify_all()
+        except (EOFError, OSError):
+            # Worker went away between batches
+            pass
+        finally:
+            conn.close()
+
+    def _exchange(self, conn, batch_id: int) -> Tuple[str, object]:
+        """Send a batch to a worker and wait for its reply.
+
+        Returns:
+            ('result', list of game results) or ('error', error message).
+
+        Raises:
+            TimeoutError: No reply within batch_timeout.
+            ValueError: The reply is not for this batch or not shaped like one.
+        """
+        conn.send(('batch', batch_id, self.batches[batch_id].seeds, self.num_computers))
+        if self.batch_timeout is not None and not conn.poll(self.batch_timeout):
+            raise TimeoutError(f"No reply for batch {batch_id} within {self.batch_timeout}s")
+
+        reply = conn.recv()
+        if not (isinstance(reply, tuple) and len(reply) == 3 and reply[1] == batch_id
+                and (reply[0] == 'error' or (reply[0] == 'result' and isinstance(reply[2], list)))):
+            raise ValueError(f"Malformed reply for batch {batch_id}: {reply!r:.200}")
+        return reply[0], reply[2]
+
+    def _warn_stragglers(self) -> None:
+        # Called with self._cond held. Flag slow batches while they are still running, since a hung
+        # worker would otherwise only show up once the run ends.
+        if not self._timings:
+            return
+
+        median = statistics.median(t for _, _, t in self._timings)
+        now = time.monotonic()
+        for batch_id, (name, started) in self._running.items():
+            if (batch_id, started) not in self._warned and now - started > self.straggler_factor * median:
+                self._warned.add((batch_id, started))
+                print(f"Straggler: batch {batch_id} on {name} running for {now - started:.1f}s", file=sys.stderr)
+
+    def _fail(self, batch_id: int, error: str) -> None:
+        # Called with self._cond held
+        self._failures[batch_id] = self._failures.get(batch_id, 0) + 1
+        if self._failures[batch_id] >= self.max_failures:
+            self._failed[batch_id] = error
+        else:
+            self._pending.append(batch_id)
+
+    def _report(self, resumed: int, elapsed: float) -> Report:
+        workers = sorted(WorkerStats(*stats) for stats in self._workers)
+        stragglers = []
+        if self._timings:
+            median = statistics.median(t for _, _, t in self._timings)
+            stragglers = [Straggler(b, w, t) for b, w, t in self._timings if t > self.straggler_factor * median]
+        failed = [Failure(b, e) for b, e in sorted(self._failed.items())]
+
+        return Report(sum(w.games for w in workers), resumed, elapsed, workers, stragglers, failed)
+
+
+class Worker:
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes = None, name: str = None):
+        """Play batches handed out by a Coordinator until told to stop.
+
+        Arguments:
+            address: (host, port) of the coordinator.
+            authkey: Shared secret, must match the coordinator's. Required unless the coordinator
+                is on a loopback address, see `resolve_authkey`.
+            name: Name used in reports. Defaults to <hostname>:<pid>:<random suffix>, so that
+                several workers in one process can still be told apart.
+        """
+        self.address = address
+        self.authkey = resolve_authkey(address[0], authkey)
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self._pools: Dict[int, game.GamePool] = {}
+
+    def run(self) -> int:
+        """Process batches until the coordinator stops us.
+
+        Returns:
+            Number of games played.
+        """
+        played = 0
+        with Client(self.address, authkey=self.authkey) as conn:
+            conn.send(('ready', self.name))
+            while True:
+                msg = conn.recv()
+                if msg[0] == 'stop':
+                    return played
+
+                _, batch_id, seeds, num_computers = msg
+                if num_computers not in self._pools:
+                    self._pools[num_computers] = game.GamePool(num_computers)
+                pool = self._pools[num_computers]
+                try:
+                    results = [play_game(seed, num_computers, pool=pool) for seed in seeds]
+                except Exception as e:
+                    # Let the coordinator decide whether to retry; keep serving other batches
+                    conn.send(('error', batch_id, repr(e)))
+                    continue
+                conn.send(('result', batch_id, results))
+                played += len(results)
+
+
+def format_report(report: Report) -> str:
+    lines = [f"Played {report.games} games in {report.elapsed:.2f}s "
+             f"({report.games / report.elapsed if report.elapsed else 0:.1f} games/s), "
+             f"{report.resumed} resumed from checkpoint"]
+    for w in report.workers:
+        rate = w.games / w.busy if w.busy else 0
+        lines.append(f"\t{w.name}: {w.batches} batches, {w.games} games, {rate:.1f} games/s")
+    if report.stragglers:
+        lines.append("Stragglers:")
+        for s in report.stragglers:
+            lines.append(f"\tbatch {s.batch} on {s.worker}: {s.elapsed:.2f}s")
+    if report.failed:
+        lines.append("Failed batches:")
+        for f in report.failed:
+            lines.append(f"\tbatch {f.batch}: {f.error}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='localhost', help='Coordinator host')
+    parser.add_argument('--port', type=int, default=6543, help='Coordinator port')
+    parser.add_argument('--authkey', default=None,
+                        help=f'Shared secret for workers, defaults to ${AUTHKEY_ENV}. Required unless host is loopback')
+    subparsers = parser.add_subparsers(dest='mode')
+    subparsers.required = True
+
+    coord = subparsers.add_parser('coordinator', help='Hand out games and checkpoint results')
+    coord.add_argument('checkpoint', help='Checkpoint file, resumed if it exists')
+    coord.add_argument('-g', '--games', type=int, required=True, help='Number of games to play')
+    coord.add_argument('-b', '--batch_size', type=int, default=100, help='Games per batch')
+    coord.add_argument('-s', '--start_seed', type=int, default=0, help='Seed of the first game')
+    coord.add_argument('-c', '--computers', type=int, default=2, help='Number of computer players')
+    coord.add_argument('--straggler_factor', type=float, default=3.0,
+                       help='Report batches slower than this multiple of the median')
+    coord.add_argument('--max_failures', type=int, default=3, help='Give up on a batch after this many failures')
+    coord.add_argument('--batch_timeout', type=float, default=600.0,
+                       help='Seconds to wait for a batch before dropping the worker (0 waits forever)')
+
+    worker = subparsers.add_parser('worker', help='Play games handed out by a coordinator')
+    worker.add_argument('--name', default=None, help='Worker name used in reports')
+
+    args = parser.parse_args()
+    address = (args.host, args.port)
+    authkey = args.authkey or os.environ.get(AUTHKEY_ENV)
+    try:
+        authkey = resolve_authkey(args.host, authkey.encode() if authkey else None)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.mode == 'coordinator':
+        c = Coordinator(args.checkpoint, args.games, batch_size=args.batch_size, start_seed=args.start_seed,
+                        num_computers=args.computers, address=address, authkey=authkey,
+                        straggler_factor=args.straggler_factor, max_failures=args.max_failures,
+                        batch_timeout=args.batch_timeout or None)
+        print(f"Listening on {c.address[0]}:{c.address[1]}")
+        print(format_report(c.serve()))
+    else:
+        Worker(address, authkey=authkey, name=args.name).run()
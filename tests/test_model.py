@@ -1,4 +1,7 @@
+import pytest
+
 import pycard.model as pm
+from pycard.model import deck as pm_deck, game
 
 from io import StringIO
 
@@ -34,6 +37,21 @@ def test_deck_deal():
     assert len(new_deck) == 38
 
 
+def test_deck_deal_into():
+    d = pm_deck.Deck()
+    expected, rest = pm_deck.Deck().deal(7, 2)
+    hands = [[], []]
+    d.deal_into(hands, 7)
+    assert hands == expected
+    assert d._cards == rest._cards
+
+    d.reset()
+    assert d._cards == list(pm_deck.STANDARD_CARDS)
+    with pytest.raises(ValueError):
+        d.deal_into([[], [], [], [], []], 13)
+    assert len(d) == 52
+
+
 def test_player_draw():
     p = pm.Player('test', [], computer=True)
     g = pm.Game()
@@ -73,3 +91,57 @@ def test_game_draw(rummy, monkeypatch):
     prevdiscard = len(rummy.discard)
     rummy.players['p0'].draw(rummy)
     assert len(rummy.discard) + 3 == prevdiscard
+
+
+def test_game_reset():
+    fresh = game.Game.initialize(num_players=0, num_computers=3, seed=11)
+    g = game.Game.initialize(num_players=0, num_computers=3, seed=5)
+    g.run()
+    stock, agents = g.stock, list(g.players.values())
+    hands = [p.hand for p in agents]
+
+    assert g.reset(seed=11) is g
+    assert g.stock is stock
+    assert all(a is b for a, b in zip(g.players.values(), agents))
+    assert all(p.hand is h for p, h in zip(agents, hands))
+    assert all(p.melds == [] for p in agents)
+    assert g.discard == []
+
+    # Same deal as Deck.deal on the same shuffle
+    d = pm_deck.Deck()
+    d.shuffle(seed=11)
+    expected_hands, expected_stock = d.deal(7, 3)
+    assert hands == expected_hands
+    assert g.stock._cards == expected_stock._cards
+    assert g.run() == fresh.run()
+
+
+def test_game_reset_custom_deck():
+    cards = list(pm_deck.STANDARD_CARDS[:30])
+    g = game.Game.initialize(d=pm_deck.Deck(cards=list(cards)), num_players=0, num_computers=2)
+    g.run()
+    g.reset()
+    assert g.players['c0'].hand == cards[:13]
+    assert g.players['c1'].hand == cards[13:26]
+    assert g.stock._cards == cards[26:]
+
+    g.reset(seed=1)
+    dealt = g.players['c0'].hand + g.players['c1'].hand + g.stock._cards
+    assert dealt != cards
+    assert len(dealt) == len(cards)
+    assert set(dealt) == set(cards)
+
+
+def test_game_pool():
+    pool = game.GamePool(2, size=1)
+    assert len(pool) == 1
+    with pool.checkout(seed=3) as g:
+        assert len(pool) == 0
+        scores = g.run()
+    assert len(pool) == 1
+    with pool.checkout(seed=3) as g2:
+        assert g2 is g
+        assert g2._state_history == []
+        g2._debug = True
+        g2.print_gamestate()
+        assert g2.run() == scores
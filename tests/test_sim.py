@@ -0,0 +1,244 @@
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import pytest
+
+from pycard import sim
+
+
+def run_workers(coordinator, count):
+    workers = [sim.Worker(coordinator.address, name=f'w{i}') for i in range(count)]
+    threads = [threading.Thread(target=w.run, daemon=True) for w in workers]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def start_serving(coordinator):
+    thread = threading.Thread(target=lambda: setattr(coordinator, 'report', coordinator.serve()), daemon=True)
+    thread.start()
+    return thread
+
+
+def finish_serving(coordinator, thread):
+    # Fail instead of freezing the suite if the coordinator hangs
+    thread.join(timeout=30)
+    assert not thread.is_alive()
+    return coordinator.report
+
+
+def fake_worker(coordinator):
+    conn = Client(coordinator.address, authkey=sim.DEFAULT_AUTHKEY)
+    conn.send(('ready', 'fake'))
+    msg = conn.recv()
+    assert msg[0] == 'batch'
+    return conn, msg
+
+
+def test_play_game_deterministic():
+    assert sim.play_game(7, 3) == sim.play_game(7, 3)
+
+
+def test_make_batches():
+    batches = sim.make_batches(10, 4, start_seed=100)
+    assert [b.id for b in batches] == [0, 1, 2]
+    assert batches[0].seeds == [100, 101, 102, 103]
+    assert batches[2].seeds == [108, 109]
+
+
+def test_coordinator(tmpdir):
+    c = sim.Coordinator(str(tmpdir.join('ckpt')), 20, batch_size=3)
+    serve = start_serving(c)
+    threads = run_workers(c, 2)
+    report = finish_serving(c, serve)
+    for t in threads:
+        t.join(timeout=30)
+
+    assert report.games == 20
+    assert report.resumed == 0
+    assert sum(w.games for w in report.workers) == 20
+    assert [r['seed'] for r in c.results()] == list(range(20))
+    assert c.results()[5] == sim.play_game(5, 2)
+
+
+def test_coordinator_resume(tmpdir):
+    path = str(tmpdir.join('ckpt'))
+    c = sim.Coordinator(path, 20, batch_size=5)
+    c.checkpoint.load()
+    c.checkpoint.record(1, [sim.play_game(s, 2) for s in range(5, 10)])
+    with open(path, 'a') as f:
+        f.write('{"batch": 2, "resu')
+
+    c = sim.Coordinator(path, 20, batch_size=5)
+    serve = start_serving(c)
+    run_workers(c, 1)
+    report = finish_serving(c, serve)
+    assert report.resumed == 5
+    assert report.games == 15
+    assert [r['seed'] for r in c.results()] == list(range(20))
+
+    # Nothing left to do
+    c = sim.Coordinator(path, 20, batch_size=5)
+    assert c.serve().games == 0
+
+
+def test_coordinator_config_mismatch(tmpdir):
+    path = str(tmpdir.join('ckpt'))
+    sim.Coordinator(path, 20, batch_size=5).checkpoint.load()
+    c = sim.Coordinator(path, 20, batch_size=4)
+    address = c.address
+    with pytest.raises(ValueError):
+        c.serve()
+
+    # The port is released again
+    Listener(address).close()
+
+
+def test_checkpoint_unreadable(tmpdir):
+    path = tmpdir.join('ckpt')
+    path.write('')
+    c = sim.Coordinator(str(path), 4, batch_size=2)
+    assert c.checkpoint.load() == {}
+
+    c.checkpoint.record(0, [sim.play_game(s, 2) for s in range(2)])
+    with open(str(path), 'a') as f:
+        f.write('1\n{"results": []}\n')
+
+    c = sim.Coordinator(str(path), 4, batch_size=2)
+    assert list(c.checkpoint.load()) == [0]
+    assert len(path.readlines()) == 2
+
+
+def test_checkpoint_refuses_other_files(tmpdir):
+    path = tmpdir.join('results.csv')
+    path.write('a,b\n1,2\n')
+    c = sim.Coordinator(str(path), 4, batch_size=2)
+    with pytest.raises(ValueError):
+        c.serve()
+    assert path.read() == 'a,b\n1,2\n'
+
+
+def test_coordinator_invalid_players(tmpdir):
+    for n in (0, 8):
+        with pytest.raises(ValueError):
+            sim.Coordinator(str(tmpdir.join('ckpt')), 4, num_computers=n)
+
+
+def test_resolve_authkey():
+    assert sim.resolve_authkey('localhost') == sim.DEFAULT_AUTHKEY
+    assert sim.resolve_authkey('127.0.0.1', b'secret') == b'secret'
+    assert sim.resolve_authkey('0.0.0.0', b'secret') == b'secret'
+    for key in (None, sim.DEFAULT_AUTHKEY):
+        with pytest.raises(ValueError):
+            sim.resolve_authkey('0.0.0.0', key)
+
+
+def test_coordinator_requeues_lost_batch(tmpdir):
+    c = sim.Coordinator(str(tmpdir.join('ckpt')), 6, batch_size=3)
+    serve = start_serving(c)
+
+    # A worker that takes a batch and dies
+    conn, _ = fake_worker(c)
+    conn.close()
+
+    run_workers(c, 1)
+    report = finish_serving(c, serve)
+    assert report.games == 6
+    assert [r['seed'] for r in c.results()] == list(range(6))
+
+
+def test_coordinator_requeues_malformed_reply(tmpdir):
+    c = sim.Coordinator(str(tmpdir.join('ckpt')), 6, batch_size=3)
+    serve = start_serving(c)
+
+    conn, msg = fake_worker(c)
+    conn.send(('result', msg[1]))
+
+    run_workers(c, 1)
+    report = finish_serving(c, serve)
+    conn.close()
+    assert report.games == 6
+    assert report.failed == []
+    assert [r['seed'] for r in c.results()] == list(range(6))
+
+
+def test_coordinator_times_out_hung_worker(tmpdir):
+    c = sim.Coordinator(str(tmpdir.join('ckpt')), 6, batch_size=3, batch_timeout=0.5, max_failures=1)
+    serve = start_serving(c)
+
+    # Takes a batch and never answers
+    conn, msg = fake_worker(c)
+
+    run_workers(c, 1)
+    report = finish_serving(c, serve)
+    conn.close()
+    assert report.games == 3
+    assert [f.batch for f in report.failed] == [msg[1]]
+    assert 'TimeoutError' in report.failed[0].error
+
+
+def test_coordinator_checkpoint_write_failure(tmpdir, monkeypatch):
+    c = sim.Coordinator(str(tmpdir.join('ckpt')), 6, batch_size=3)
+    record = c.checkpoint.record
+    calls = []
+
+    def flaky(batch_id, results):
+        calls.append(batch_id)
+        if len(calls) == 1:
+            raise OSError('disk full')
+        record(batch_id, results)
+
+    monkeypatch.setattr(c.checkpoint, 'record', flaky)
+    serve = start_serving(c)
+    run_workers(c, 1)
+    report = finish_serving(c, serve)
+    assert report.games == 6
+    assert len(calls) == 3
+    assert sorted(c.checkpoint.completed) == [0, 1]
+
+
+def test_coordinator_rejects_bad_authkey(tmpdir):
+    c = sim.Coordinator(str(tmpdir.join('ckpt')), 6, batch_size=3)
+    serve = start_serving(c)
+
+    with pytest.raises(AuthenticationError):
+        Client(c.address, authkey=b'wrong')
+
+    run_workers(c, 1)
+    report = finish_serving(c, serve)
+    assert report.games == 6
+
+
+def test_coordinator_gives_up_on_failing_batch(tmpdir, monkeypatch):
+    play_game = sim.play_game
+
+    def flaky(seed, num_computers, pool=None):
+        if seed == 4:
+            raise RuntimeError('boom')
+        return play_game(seed, num_computers, pool=pool)
+
+    monkeypatch.setattr(sim, 'play_game', flaky)
+    c = sim.Coordinator(str(tmpdir.join('ckpt')), 9, batch_size=3, max_failures=2)
+    serve = start_serving(c)
+    threads = run_workers(c, 2)
+    report = finish_serving(c, serve)
+    for t in threads:
+        t.join(timeout=30)
+
+    assert report.games == 6
+    assert [f.batch for f in report.failed] == [1]
+    assert 'boom' in report.failed[0].error
+    assert sorted(c.checkpoint.completed) == [0, 2]
+
+
+def test_coordinator_stats_per_connection(tmpdir):
+    c = sim.Coordinator(str(tmpdir.join('ckpt')), 20, batch_size=1)
+    workers = [sim.Worker(c.address, name='same') for _ in range(2)]
+    assert sim.Worker(c.address).name != sim.Worker(c.address).name
+    serve = start_serving(c)
+    for w in workers:
+        threading.Thread(target=w.run, daemon=True).start()
+    report = finish_serving(c, serve)
+    assert [w.name for w in report.workers] == ['same', 'same']
+    assert sum(w.games for w in report.workers) == 20